@@ -1,18 +1,17 @@
 # app.py
 import streamlit as st
 from st_supabase_connection import SupabaseConnection
-import hashlib
-import pandas as pd
 import requests
+from PIL import Image
+import io
+import time
 import urllib.parse
 
 
 st.set_page_config(page_title="AI Prompt Hub", layout="wide")
 
-def hash_password(password):
-    """Hashes a password for storing."""
-    return hashlib.sha256(password.encode()).hexdigest()
-
+# Talks to Supabase over HTTP (PostgREST), which pools Postgres connections server-side;
+# st.connection keeps one client per process, so no driver-level pool settings apply here.
 conn = st.connection("supabase", type=SupabaseConnection)
 
 def log_metric(event_type, details={}):
@@ -26,26 +25,92 @@ def log_metric(event_type, details={}):
             "username": username,
             "event_type": event_type,
             "details": details
-        }).execute()
+        }, returning="minimal").execute()
     except Exception as e:
         print(f"Error logging metric: {e}")
 
+@st.cache_data(ttl=60, show_spinner=False)
+def load_approved_prompts(user_id, search=None, tags=None):
+    """Fetches approved prompts with rating stats and the fetch start time. Cleared on approval; votes are overlaid from session_state instead."""
+    fetched_at = time.time()
+    prompts_data = conn.client.rpc('get_approved_prompts_with_stats', {
+        'p_user_id': user_id,
+        'p_search': search,
+        'p_tags': tags
+    }).execute().data
+    return prompts_data, fetched_at
+
+def apply_local_vote(prompt, rating):
+    """Folds the user's latest vote into a prompt's cached rating stats."""
+    total = prompt['avg_rating'] * prompt['vote_count']
+    if prompt['user_rating'] is None:
+        prompt['vote_count'] += 1
+    else:
+        total -= prompt['user_rating']
+    prompt['avg_rating'] = (total + rating) / prompt['vote_count']
+    prompt['user_rating'] = rating
+
+def save_vote(prompt_id):
+    """Upserts the rating picked in a prompt's star widget and records it locally."""
+    rating = st.session_state[f"star_{prompt_id}"]
+    new_rating = rating + 1 if rating is not None else 0
+    conn.client.table("votes").upsert(
+        {
+            "prompt_id": prompt_id,
+            "user_id": st.session_state.user_id,
+            "rating": new_rating
+        },
+        on_conflict="prompt_id,user_id",
+        returning="minimal"
+    ).execute()
+    st.session_state.setdefault('user_votes', {})[prompt_id] = (new_rating, time.time())
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_approved_tags():
+    """Returns the sorted list of tags used by approved prompts."""
+    return [t['tag'] for t in conn.client.rpc('distinct_tags', {}).execute().data]
+
+LOGO_WIDTH = 250
+
+@st.cache_resource
+def load_logo():
+    """Returns logo.png resized to LOGO_WIDTH as PNG bytes, built once per process."""
+    with Image.open("logo.png") as logo:
+        height = round(logo.height * LOGO_WIDTH / logo.width)
+        buffer = io.BytesIO()
+        logo.resize((LOGO_WIDTH, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@st.cache_resource
+def get_slack_config():
+    """Reads the Slack OAuth secrets and builds the authorize URL once per process."""
+    config = {
+        "client_id": st.secrets["SLACK_CLIENT_ID"],
+        "client_secret": st.secrets["SLACK_CLIENT_SECRET"],
+        "redirect_uri": st.secrets["REDIRECT_URI"],
+        "scopes": "identity.basic,identity.email",
+    }
+    slack_auth_url_params = {
+        "user_scope": config["scopes"],
+        "client_id": config["client_id"],
+        "redirect_uri": config["redirect_uri"],
+    }
+    config["auth_url"] = f"https://slack.com/oauth/v2/authorize?{urllib.parse.urlencode(slack_auth_url_params)}"
+    return config
+
+@st.cache_resource
+def http_session():
+    """Shared requests session so Slack API calls reuse pooled keep-alive connections."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=2)
+    session.mount("https://", adapter)
+    return session
+
 try:
-    SLACK_CLIENT_ID = st.secrets["SLACK_CLIENT_ID"]
-    SLACK_CLIENT_SECRET = st.secrets["SLACK_CLIENT_SECRET"]
-    REDIRECT_URI = st.secrets["REDIRECT_URI"]
-    SLACK_SCOPES = "identity.basic,identity.email"
+    slack_cfg = get_slack_config()
 except KeyError:
     st.error("Slack credentials are not configured in Streamlit secrets.")
     st.stop()
-    
-
-slack_auth_url_params = {
-    "user_scope": SLACK_SCOPES,
-    "client_id": SLACK_CLIENT_ID,
-    "redirect_uri": REDIRECT_URI,
-}
-slack_auth_url = f"https://slack.com/oauth/v2/authorize?{urllib.parse.urlencode(slack_auth_url_params)}"
 
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -64,11 +129,14 @@ with st.sidebar:
     if "code" in query_params and not st.session_state.logged_in:
         code = query_params["code"]
         token_url = "https://slack.com/api/oauth.v2.access"
-        response = requests.post(token_url, data={
-            "client_id": SLACK_CLIENT_ID, "client_secret": SLACK_CLIENT_SECRET,
-            "code": code, "redirect_uri": REDIRECT_URI
-        })
-        token_data = response.json()
+        try:
+            response = http_session().post(token_url, data={
+                "client_id": slack_cfg["client_id"], "client_secret": slack_cfg["client_secret"],
+                "code": code, "redirect_uri": slack_cfg["redirect_uri"]
+            }, timeout=5)
+            token_data = response.json()
+        except requests.RequestException as e:
+            token_data = {"ok": False, "error": str(e)}
         
         if token_data.get("ok"):
             user_identity = token_data.get("authed_user", {})
@@ -88,6 +156,7 @@ with st.sidebar:
             st.session_state.username = ""
             st.session_state.user_id = ""
             st.session_state.role = ""
+            st.session_state.pop('user_votes', None)
             st.query_params.clear()
             st.rerun()
 
@@ -96,7 +165,7 @@ with st.sidebar:
 
         with member_tab:
             st.write("Login with your MDPlus Slack account.")
-            st.link_button("Login with Slack", slack_auth_url, use_container_width=True, type="primary")
+            st.link_button("Login with Slack", slack_cfg["auth_url"], use_container_width=True, type="primary")
 
         with admin_tab:
             st.write("For administrative access only.")
@@ -106,11 +175,10 @@ with st.sidebar:
                 login_button = st.form_submit_button("Login as Admin")
 
                 if login_button:
-                    password_hash = hash_password(password)
-                    user_data = conn.client.table("users").select("*", count="exact").eq("username", username).eq("password_hash", password_hash).eq("role", "admin").execute()
+                    user_data = conn.client.rpc('authenticate_admin', {'u': username, 'p': password}).execute().data
                     
-                    if user_data.count > 0:
-                        user = user_data.data[0]
+                    if user_data:
+                        user = user_data[0]
                         st.session_state.logged_in = True
                         st.session_state.username = user['username']
                         st.session_state.user_id = user['id']
@@ -120,7 +188,7 @@ with st.sidebar:
                         st.error("Invalid admin credentials or not an admin.")
 
 
-st.image("logo.png", width=250)
+st.image(load_logo(), width=LOGO_WIDTH)
 st.title("AI Prompt Library")
 st.markdown("Discover, share, and vote on the best AI prompts.")
 st.markdown("For any issues, please reach out to sahil.suresh@tufts.edu")
@@ -128,64 +196,49 @@ st.markdown("For any issues, please reach out to sahil.suresh@tufts.edu")
 tab_view, tab_submit, tab_admin = st.tabs(["View Prompts", "Submit a Prompt", "Admin Panel"])
 
 
-with tab_view:
+@st.fragment
+def render_view_tab():
     st.header("Approved Community Prompts")
-    prompts_data = conn.client.rpc('get_approved_prompts_with_username', {}).execute().data
+    st.subheader("Search and Filter")
     
-    if not prompts_data:
-        st.info("No prompts have been approved yet. Check back later!")
-    else:
-        prompts_df = pd.DataFrame(prompts_data)
-        
-        def calculate_avg_rating(prompt_id):
-            rating_data = conn.client.table("votes").select("rating", count="exact").eq("prompt_id", prompt_id).execute()
-            if rating_data.count > 0:
-                return sum(r['rating'] for r in rating_data.data) / rating_data.count
-            return 0
-        
-        
-        
-        
-        prompts_df['avg_rating'] = prompts_df['id'].apply(calculate_avg_rating)
-        
-        prompts_df = prompts_df.sort_values(by='avg_rating', ascending=False).reset_index(drop=True)
-        
-        st.subheader("Search and Filter")
-        
-        search_query = st.text_input("Search by keyword in title or prompt text", placeholder="e.g., cardiology, exam, note")
-        
-        all_tags = set()
-        for t in prompts_df['tags'].dropna():
-            all_tags.update([tag.strip() for tag in t.split(',')])
-        sorted_tags = sorted(list(all_tags))
-        
-        selected_tags = st.multiselect("Filter by tags", options=sorted_tags)
-
-        filtered_df = prompts_df.copy() 
+    search_query = st.text_input("Search by keyword in title or prompt text", placeholder="e.g., cardiology, exam, note")
+    selected_tags = st.multiselect("Filter by tags", options=load_approved_tags())
 
-        if search_query:
-            filtered_df = filtered_df[
-                filtered_df['title'].str.contains(search_query, case=False, na=False) |
-                filtered_df['prompt_text'].str.contains(search_query, case=False, na=False)
-            ]
-
-        if selected_tags:
-            for tag in selected_tags:
-                filtered_df = filtered_df[filtered_df['tags'].str.contains(tag, case=False, na=False)]
-                
-        if search_query or selected_tags:
-            log_metric("search", {"query": search_query, "tags": selected_tags})
+    prompts_data, fetched_at = load_approved_prompts(
+        str(st.session_state.user_id) if st.session_state.logged_in else None,
+        search_query or None,
+        selected_tags or None
+    )
 
+    if search_query or selected_tags:
+        log_metric("search", {"query": search_query, "tags": selected_tags})
+    
+    if not prompts_data and not (search_query or selected_tags):
+        st.info("No prompts have been approved yet. Check back later!")
+    else:
         st.markdown(f"---")
-        st.write(f"**{len(filtered_df)} prompts found**")
+        st.write(f"**{len(prompts_data)} prompts found**")
 
-        if filtered_df.empty:
+        if not prompts_data:
             st.warning("No prompts match your current search criteria.")
         else:
+            local_votes = st.session_state.setdefault('user_votes', {})
+            for p in prompts_data:
+                if p['id'] in local_votes:
+                    rating, voted_at = local_votes[p['id']]
+                    if p['user_rating'] == rating or fetched_at > voted_at:
+                        del local_votes[p['id']]
+                    else:
+                        apply_local_vote(p, rating)
+
+            prompts_data = sorted(prompts_data, key=lambda p: -p['avg_rating'])
+
             if 'viewed_prompts' not in st.session_state:
                 st.session_state.viewed_prompts = set()
 
-            for index, row in filtered_df.iterrows():
+            user_votes = {p['id']: p['user_rating'] for p in prompts_data if p['user_rating'] is not None}
+
+            for row in prompts_data:
                 with st.expander(f"**{row['title']}** (Category: {row['category']})", expanded=False):
                     if row['id'] not in st.session_state.viewed_prompts:
                         log_metric("prompt_view", {"prompt_id": row['id'], "prompt_title": row['title']})
@@ -200,36 +253,21 @@ with tab_view:
 
                     col1, col2 = st.columns([1, 2])
                     with col1:
-                        rating_data = conn.client.table("votes").select("rating", count="exact").eq("prompt_id", row['id']).execute()
-                        avg_rating = sum(r['rating'] for r in rating_data.data) / rating_data.count if rating_data.count > 0 else 0
-                        st.markdown(f"**Rating: {avg_rating:.2f} / 5** ({rating_data.count} votes)")
+                        st.markdown(f"**Rating: {row['avg_rating']:.2f} / 5** ({row['vote_count']} votes)")
 
                     with col2:
                         if st.session_state.logged_in:
-                            user_vote_data = conn.client.table("votes").select("rating").eq("prompt_id", row['id']).eq("user_id", st.session_state.user_id).execute().data
-                            user_vote = user_vote_data[0]['rating'] if user_vote_data else 0
+                            user_vote = user_votes.get(row['id'], 0)
                             
-                            star_cols = st.columns(5)
-                            for i, star_col in enumerate(star_cols, 1):
-                                with star_col:
-                                    if st.button("⭐" if i <= user_vote else "☆", key=f"star_{row['id']}_{i}", use_container_width=True):
-                                        new_rating = i
-                                        if new_rating == user_vote: new_rating = 0
-                                        
-                                        conn.client.table("votes").upsert(
-                                            {
-                                                "prompt_id": row['id'],
-                                                "user_id": st.session_state.user_id,
-                                                "rating": new_rating
-                                            },
-                                            on_conflict="prompt_id,user_id"
-                                        ).execute()
-                                        st.rerun()
+                            feedback_key = f"star_{row['id']}"
+                            st.session_state[feedback_key] = user_vote - 1 if user_vote else None
+                            st.feedback("stars", key=feedback_key, on_change=save_vote, args=(row['id'],))
                                         
                         else:
                             st.warning("Login to vote!")
 
-with tab_submit:
+@st.fragment
+def render_submit_tab():
     st.header("Share Your Own Prompt")
     if st.session_state.logged_in:
         tag_options = {
@@ -299,7 +337,7 @@ with tab_submit:
                         "submitted_by_id": st.session_state.user_id,
                         "username": st.session_state.username,
                         "status": "pending"
-                    }).execute()
+                    }, returning="minimal").execute()
                     st.success("Your prompt has been submitted for admin approval. Thank you!")
                 else:
                     st.warning("Please fill out all fields, including at least one tag.")
@@ -308,16 +346,18 @@ with tab_submit:
         
         
 
-with tab_admin:
+@st.fragment
+def render_admin_tab():
     if st.session_state.role == 'admin':
         st.header("Admin Approval Queue")
-        pending_prompts_data = conn.client.rpc('get_pending_prompts_with_username', {}).execute().data
+        pending_prompts_data = st.session_state.pop("pending_prompts", None)
+        if pending_prompts_data is None:
+            pending_prompts_data = conn.client.rpc('get_pending_prompts_with_username', {}).execute().data
 
         if not pending_prompts_data:
             st.info("No prompts are currently awaiting approval.")
         else:
-            pending_df = pd.DataFrame(pending_prompts_data)
-            for index, row in pending_df.iterrows():
+            for row in pending_prompts_data:
                 with st.container(border=True):
                     st.subheader(f"'{row['title']}' by {row['username']}")
                     st.markdown(f"**Category:** {row['category']}")
@@ -330,11 +370,23 @@ with tab_admin:
                     col1, col2, col3 = st.columns([1, 1, 5])
                     with col1:
                         if st.button("Approve", key=f"approve_{row['id']}", type="primary"):
-                            conn.client.table("prompts").update({"status": "approved"}).eq("id", row['id']).execute()
+                            st.session_state.pending_prompts = conn.client.rpc('set_prompt_status', {'p_id': row['id'], 'p_status': 'approved'}).execute().data
+                            load_approved_prompts.clear()
+                            load_approved_tags.clear()
                             st.rerun()
                     with col2:
                         if st.button("Reject", key=f"reject_{row['id']}"):
-                            conn.client.table("prompts").update({"status": "rejected"}).eq("id", row['id']).execute()
+                            st.session_state.pending_prompts = conn.client.rpc('set_prompt_status', {'p_id': row['id'], 'p_status': 'rejected'}).execute().data
                             st.rerun()
     else:
-        st.error("You do not have permission to view this page.")
\ No newline at end of file
+        st.error("You do not have permission to view this page.")
+
+
+with tab_view:
+    render_view_tab()
+
+with tab_submit:
+    render_submit_tab()
+
+with tab_admin:
+    render_admin_tab()
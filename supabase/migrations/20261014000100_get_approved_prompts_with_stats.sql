@@ -0,0 +1,34 @@
+-- Approved prompts together with their rating aggregates and the caller's own vote,
+-- so the View Prompts tab needs a single round trip instead of one query per prompt.
+create or replace function get_approved_prompts_with_stats(p_user_id text default null)
+returns table (
+    id bigint,
+    title text,
+    prompt_text text,
+    category text,
+    model text,
+    tags text,
+    username text,
+    avg_rating double precision,
+    vote_count bigint,
+    user_rating integer
+)
+language sql
+stable
+as $$
+    select
+        p.id,
+        p.title,
+        p.prompt_text,
+        p.category,
+        p.model,
+        p.tags,
+        p.username,
+        avg(v.rating)::double precision as avg_rating,
+        count(v.rating) as vote_count,
+        max(case when v.user_id::text = p_user_id then v.rating end)::integer as user_rating
+    from prompts p
+    left join votes v on v.prompt_id = p.id
+    where p.status = 'approved'
+    group by p.id;
+$$;
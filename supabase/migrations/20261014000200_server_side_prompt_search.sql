@@ -0,0 +1,50 @@
+-- Move keyword search and tag filtering into get_approved_prompts_with_stats so the
+-- client only receives the rows it is going to render.
+create extension if not exists pg_trgm;
+
+create index if not exists prompts_title_trgm_idx on prompts using gin (title gin_trgm_ops);
+create index if not exists prompts_prompt_text_trgm_idx on prompts using gin (prompt_text gin_trgm_ops);
+create index if not exists prompts_tags_array_idx on prompts using gin (string_to_array(lower(tags), ', '));
+
+drop function if exists get_approved_prompts_with_stats(text);
+
+create or replace function get_approved_prompts_with_stats(
+    p_user_id text default null,
+    p_search text default null,
+    p_tags text[] default null
+)
+returns table (
+    id bigint,
+    title text,
+    prompt_text text,
+    category text,
+    model text,
+    tags text,
+    username text,
+    avg_rating double precision,
+    vote_count bigint,
+    user_rating integer
+)
+language sql
+stable
+as $$
+    select
+        p.id,
+        p.title,
+        p.prompt_text,
+        p.category,
+        p.model,
+        p.tags,
+        p.username,
+        avg(v.rating)::double precision as avg_rating,
+        count(v.rating) as vote_count,
+        max(case when v.user_id::text = p_user_id then v.rating end)::integer as user_rating
+    from prompts p
+    left join votes v on v.prompt_id = p.id
+    where p.status = 'approved'
+      and (p_search is null
+           or p.title ilike '%' || p_search || '%'
+           or p.prompt_text ilike '%' || p_search || '%')
+      and (p_tags is null or string_to_array(lower(p.tags), ', ') @> p_tags)
+    group by p.id;
+$$;
@@ -0,0 +1,107 @@
+-- Store one row per (prompt, tag) so tag filtering is an indexed equality lookup and the
+-- sidebar tag list is a DISTINCT over tags rather than a scan of every prompt.
+-- prompts.tags stays the display string and the source of truth; a trigger rebuilds
+-- prompt_tags from it, so clients never write prompt_tags directly.
+create table if not exists prompt_tags (
+    prompt_id bigint not null references prompts (id) on delete cascade,
+    tag text not null,
+    primary key (prompt_id, tag)
+);
+
+create index if not exists prompt_tags_tag_idx on prompt_tags (tag);
+
+alter table prompt_tags enable row level security;
+
+drop policy if exists "prompt_tags are readable by everyone" on prompt_tags;
+create policy "prompt_tags are readable by everyone" on prompt_tags
+    for select using (true);
+
+create or replace function sync_prompt_tags()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    delete from prompt_tags where prompt_id = new.id;
+
+    insert into prompt_tags (prompt_id, tag)
+    select distinct new.id, trim(t.tag)
+    from unnest(string_to_array(new.tags, ',')) as t(tag)
+    where trim(t.tag) <> ''
+    on conflict do nothing;
+
+    return new;
+end;
+$$;
+
+drop trigger if exists prompts_sync_prompt_tags on prompts;
+create trigger prompts_sync_prompt_tags
+    after insert or update of tags on prompts
+    for each row execute function sync_prompt_tags();
+
+insert into prompt_tags (prompt_id, tag)
+select distinct p.id, trim(t.tag)
+from prompts p, unnest(string_to_array(p.tags, ',')) as t(tag)
+where trim(t.tag) <> ''
+on conflict do nothing;
+
+drop index if exists prompts_tags_array_idx;
+
+create or replace function distinct_tags()
+returns table (tag text)
+language sql
+stable
+as $$
+    select distinct pt.tag
+    from prompt_tags pt
+    join prompts p on p.id = pt.prompt_id
+    where p.status = 'approved'
+    order by pt.tag;
+$$;
+
+create or replace function get_approved_prompts_with_stats(
+    p_user_id text default null,
+    p_search text default null,
+    p_tags text[] default null
+)
+returns table (
+    id bigint,
+    title text,
+    prompt_text text,
+    category text,
+    model text,
+    tags text,
+    username text,
+    avg_rating double precision,
+    vote_count bigint,
+    user_rating integer
+)
+language sql
+stable
+as $$
+    select
+        p.id,
+        p.title,
+        p.prompt_text,
+        p.category,
+        p.model,
+        p.tags,
+        p.username,
+        avg(v.rating)::double precision as avg_rating,
+        count(v.rating) as vote_count,
+        max(case when v.user_id::text = p_user_id then v.rating end)::integer as user_rating
+    from prompts p
+    left join votes v on v.prompt_id = p.id
+    where p.status = 'approved'
+      and (p_search is null
+           or p.title ilike '%' || p_search || '%'
+           or p.prompt_text ilike '%' || p_search || '%')
+      and (p_tags is null or p.id in (
+           select pt.prompt_id
+           from prompt_tags pt
+           where pt.tag = any (p_tags)
+           group by pt.prompt_id
+           having count(*) = cardinality(p_tags)))
+    group by p.id;
+$$;
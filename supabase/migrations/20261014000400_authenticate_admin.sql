@@ -0,0 +1,46 @@
+-- Check admin credentials server-side with bcrypt instead of comparing an unsalted
+-- SHA-256 digest computed by the app.
+--
+-- Rows still holding the legacy SHA-256 hex digest are accepted once and rehashed with
+-- bcrypt on that successful login, so existing admins keep working across the deploy.
+create extension if not exists pgcrypto;
+
+create or replace function authenticate_admin(u text, p text)
+returns table (id bigint, username text, role text)
+language plpgsql
+volatile
+security definer
+set search_path = public, extensions
+as $$
+#variable_conflict use_column
+declare
+    v_user users%rowtype;
+begin
+    select * into v_user
+    from users
+    where users.username = u
+      and users.role = 'admin';
+
+    if not found then
+        -- Pay the same bcrypt cost as a real check so timing does not reveal which
+        -- admin usernames exist.
+        perform crypt(p, gen_salt('bf'));
+        return;
+    end if;
+
+    if v_user.password_hash like '$2%' then
+        if v_user.password_hash <> crypt(p, v_user.password_hash) then
+            return;
+        end if;
+    elsif v_user.password_hash = encode(digest(p, 'sha256'), 'hex') then
+        update users
+        set password_hash = crypt(p, gen_salt('bf'))
+        where users.id = v_user.id;
+    else
+        perform crypt(p, gen_salt('bf'));
+        return;
+    end if;
+
+    return query select v_user.id::bigint, v_user.username::text, v_user.role::text;
+end;
+$$;
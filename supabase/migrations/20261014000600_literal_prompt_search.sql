@@ -0,0 +1,50 @@
+-- Treat the search box as a literal substring: escape LIKE wildcards in p_search and
+-- build the pattern once per call instead of concatenating it for every row and column.
+create or replace function get_approved_prompts_with_stats(
+    p_user_id text default null,
+    p_search text default null,
+    p_tags text[] default null
+)
+returns table (
+    id bigint,
+    title text,
+    prompt_text text,
+    category text,
+    model text,
+    tags text,
+    username text,
+    avg_rating double precision,
+    vote_count bigint,
+    user_rating integer
+)
+language sql
+stable
+as $$
+    select
+        p.id,
+        p.title,
+        p.prompt_text,
+        p.category,
+        p.model,
+        p.tags,
+        p.username,
+        coalesce(avg(v.rating), 0)::double precision as avg_rating,
+        count(v.rating) as vote_count,
+        max(case when v.user_id::text = p_user_id then v.rating end)::integer as user_rating
+    from prompts p
+    cross join (
+        select '%' || replace(replace(replace(p_search, '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+    ) q
+    left join votes v on v.prompt_id = p.id
+    where p.status = 'approved'
+      and (q.pattern is null
+           or p.title ilike q.pattern
+           or p.prompt_text ilike q.pattern)
+      and (p_tags is null or p.id in (
+           select pt.prompt_id
+           from prompt_tags pt
+           where pt.tag = any (p_tags)
+           group by pt.prompt_id
+           having count(*) = cardinality(p_tags)))
+    group by p.id;
+$$;
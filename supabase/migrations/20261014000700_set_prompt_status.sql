@@ -0,0 +1,36 @@
+-- Approve or reject a prompt and return the remaining approval queue in the same call,
+-- so the admin panel does not need a second round trip to refresh it.
+create or replace function set_prompt_status(p_id bigint, p_status text)
+returns table (
+    id bigint,
+    title text,
+    prompt_text text,
+    category text,
+    model text,
+    tags text,
+    username text
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    if p_status not in ('approved', 'rejected') then
+        raise exception 'invalid prompt status: %', p_status;
+    end if;
+
+    update prompts set status = p_status where prompts.id = p_id;
+
+    return query
+    select
+        p.id::bigint,
+        p.title::text,
+        p.prompt_text::text,
+        p.category::text,
+        p.model::text,
+        p.tags::text,
+        p.username::text
+    from prompts p
+    where p.status = 'pending'
+    order by p.id;
+end;
+$$;